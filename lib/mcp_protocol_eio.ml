@@ -37,17 +37,41 @@ type agent_request = {
   mutable completed: bool;
 }
 
+(** Long-poll waiter parked on GET /agent/pending?wait=N *)
+type agent_waiter = {
+  waiter_id: int;
+  notify: unit -> unit;
+}
+
 let agent_queue : (string, agent_request) Hashtbl.t = Hashtbl.create 16
 let agent_queue_mutex = Mutex.create ()
+let agent_waiters : agent_waiter list ref = ref []
+let agent_next_waiter_id = ref 0
 
 let agent_add_request node platform prompt =
   let id = Printf.sprintf "req-%d-%d" (int_of_float (Unix.gettimeofday () *. 1000.0)) (Random.int 10000) in
   let req = { id; node; platform; prompt; created_at = Unix.gettimeofday (); result = None; completed = false } in
   Mutex.lock agent_queue_mutex;
   Hashtbl.add agent_queue id req;
+  let waiters = !agent_waiters in
+  agent_waiters := [];
   Mutex.unlock agent_queue_mutex;
+  List.iter (fun waiter -> try waiter.notify () with _ -> ()) waiters;
   id
 
+let agent_register_waiter notify =
+  Mutex.lock agent_queue_mutex;
+  incr agent_next_waiter_id;
+  let waiter_id = !agent_next_waiter_id in
+  agent_waiters := { waiter_id; notify } :: !agent_waiters;
+  Mutex.unlock agent_queue_mutex;
+  waiter_id
+
+let agent_unregister_waiter waiter_id =
+  Mutex.lock agent_queue_mutex;
+  agent_waiters := List.filter (fun w -> w.waiter_id <> waiter_id) !agent_waiters;
+  Mutex.unlock agent_queue_mutex
+
 let agent_get_pending () =
   Mutex.lock agent_queue_mutex;
   let pending = Hashtbl.fold (fun _ req acc ->
@@ -1201,10 +1225,51 @@ let agent_request_handler _request reqd =
         Response.json (Yojson.Safe.to_string result) reqd
   )
 
-(** GET /agent/pending - Agent polls for pending requests *)
-let agent_pending_handler _request reqd =
-  agent_cleanup_old ();
+(** Upper bound for GET /agent/pending?wait=N (seconds) *)
+let agent_wait_max_s = 60
+
+(** Return pending requests, parking up to [timeout_s] until one is enqueued *)
+let wait_for_agent_pending ~clock ~timeout_s =
   let pending = agent_get_pending () in
+  if pending <> [] || timeout_s <= 0 then
+    pending
+  else begin
+    let promise, resolver = Eio.Promise.create () in
+    let waiter_id =
+      agent_register_waiter (fun () ->
+        try Eio.Promise.resolve resolver () with _ -> ())
+    in
+    let pending_after = agent_get_pending () in
+    if pending_after <> [] then begin
+      agent_unregister_waiter waiter_id;
+      pending_after
+    end else begin
+      let result =
+        match Eio.Time.with_timeout clock (float_of_int timeout_s) (fun () ->
+          Eio.Promise.await promise;
+          Ok `Woke) with
+        | Ok `Woke -> `Woke
+        | Error `Timeout -> `Timeout
+      in
+      agent_unregister_waiter waiter_id;
+      match result with
+      | `Woke -> agent_get_pending ()
+      | `Timeout -> []
+    end
+  end
+
+(** GET /agent/pending - Agent polls for pending requests.
+    [?wait=N] holds the request open up to N seconds until work is queued. *)
+let agent_pending_handler ~clock request reqd =
+  agent_cleanup_old ();
+  let wait_s =
+    match Uri.get_query_param (Uri.of_string request.Httpun.Request.target) "wait" with
+    | Some v -> (match int_of_string_opt v with
+        | Some n -> max 0 (min n agent_wait_max_s)
+        | None -> 0)
+    | None -> 0
+  in
+  let pending = wait_for_agent_pending ~clock ~timeout_s:wait_s in
   let requests = List.map (fun req ->
     `Assoc [
       ("id", `String req.id);
@@ -1214,7 +1279,11 @@ let agent_pending_handler _request reqd =
       ("age_sec", `Float (Unix.gettimeofday () -. req.created_at));
     ]
   ) pending in
-  let result = `Assoc [("pending", `List requests); ("count", `Int (List.length pending))] in
+  let result = `Assoc [
+    ("pending", `List requests);
+    ("count", `Int (List.length pending));
+    ("wait", `Int wait_s);
+  ] in
   Response.json (Yojson.Safe.to_string result) reqd
 
 (** POST /agent/result - Agent submits generated code *)
@@ -2728,7 +2797,7 @@ let route_request ~clock ~domain_mgr ~sw ~eio_ctx server request reqd =
       agent_request_handler request reqd
 
   | `GET, "/agent/pending" ->
-      agent_pending_handler request reqd
+      agent_pending_handler ~clock request reqd
 
   | `POST, "/agent/result" ->
       agent_result_handler request reqd
@@ -1,26 +1,99 @@
 #!/usr/bin/env python3
 import argparse
+import functools
+import gzip
 import json
+import math
 import os
 import sys
 import time
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:  # optional: faster (de)serialization for large --full reports
+    orjson = None
 
 
 def now_iso():
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
+# Node ids like "12:34" become filename-safe "12_34"
+NODE_ID_FILENAME_TABLE = str.maketrans(":", "_")
+
+
+@functools.cache
+def default_save_dir():
+    return os.path.join(os.path.expanduser("~"), "me", "download", "figma-assets")
+
+
+@functools.cache
+def default_logs_dir():
+    return os.path.join(os.path.expanduser("~"), "me", "logs")
+
+
+def non_finite_to_none(obj):
+    # Same output as orjson, which writes NaN/Infinity as null
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: non_finite_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [non_finite_to_none(v) for v in obj]
+    return obj
+
+
+def dumps_json(obj, indent=False):
+    # Returns UTF-8 bytes; compact unless indent is requested.
+    # Non-finite floats become null with or without orjson.
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    kwargs = {"indent": 2} if indent else {"separators": (",", ":")}
+    try:
+        text = json.dumps(obj, ensure_ascii=False, allow_nan=False, **kwargs)
+    except ValueError:
+        text = json.dumps(non_finite_to_none(obj), ensure_ascii=False, allow_nan=False, **kwargs)
+    return text.encode("utf-8")
+
+
+def loads_json(data):
+    # orjson rejects the Infinity/NaN tokens Yojson emits for non-finite floats
+    # (e.g. psnr for identical renders); retry those with stdlib json.
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def write_file(path, data):
+    # Unbuffered write of pre-encoded bytes; os.write may be partial for large buffers
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)
+
+
 def post_json(url, payload, timeout=60):
-    data = json.dumps(payload).encode("utf-8")
+    data = dumps_json(payload)
     req = urllib.request.Request(
         url,
         data=data,
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"},
         method="POST",
     )
     with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.load(resp)
+        raw = resp.read()
+        if resp.headers.get("Content-Encoding", "").lower() == "gzip":
+            raw = gzip.decompress(raw)
+    return loads_json(raw)
 
 
 def call_tool(url, name, args):
@@ -42,41 +115,92 @@ def call_tool(url, name, args):
     parsed = None
     if isinstance(text, str):
         try:
-            parsed = json.loads(text)
+            parsed = loads_json(text)
         except json.JSONDecodeError:
             parsed = None
     return {"raw": result, "text": text, "parsed": parsed}
 
 
 def count_text_nodes_dsl(dsl):
-    if isinstance(dsl, dict):
-        meta = dsl.get("meta", {})
-        node_type = None
-        if isinstance(meta, dict):
-            node_type = meta.get("type")
-        self_count = 1 if node_type == "TEXT" else 0
-        children = dsl.get("children", [])
-        if isinstance(children, list):
-            return self_count + sum(count_text_nodes_dsl(c) for c in children)
-        return self_count
-    if isinstance(dsl, list):
-        return sum(count_text_nodes_dsl(c) for c in dsl)
-    return 0
+    # Iterative walk: deep trees must not hit the recursion limit.
+    # Parsed JSON only yields exact dict/list, so `type(x) is` is safe and cheaper than isinstance.
+    count = 0
+    stack = [dsl]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is dict:
+            meta = node.get("meta")
+            if type(meta) is dict and meta.get("type") == "TEXT":
+                count += 1
+            children = node.get("children")
+            if type(children) is list:
+                stack.extend(children)
+        elif node_type is list:
+            stack.extend(node)
+    return count
 
 
 def count_text_nodes_with_segments(payload):
-    if isinstance(payload, dict):
-        text = payload.get("text")
-        self_count = 0
-        if isinstance(text, dict) and isinstance(text.get("segments"), list):
-            self_count = 1
-        children = payload.get("children", [])
-        if isinstance(children, list):
-            return self_count + sum(count_text_nodes_with_segments(c) for c in children)
-        return self_count
-    if isinstance(payload, list):
-        return sum(count_text_nodes_with_segments(c) for c in payload)
-    return 0
+    count = 0
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is dict:
+            text = node.get("text")
+            if type(text) is dict and type(text.get("segments")) is list:
+                count += 1
+            children = node.get("children")
+            if type(children) is list:
+                stack.extend(children)
+        elif node_type is list:
+            stack.extend(node)
+    return count
+
+
+def count_text_nodes_fused(dsl, payload):
+    # One walk over the DSL tree and the plugin payload in lockstep (they mirror
+    # node-for-node in practice). Returns (text nodes in dsl, nodes with segments
+    # in payload). Where child lists diverge, each side falls back to its own counter.
+    total = 0
+    present = 0
+    stack = [(dsl, payload)]
+    while stack:
+        d, p = stack.pop()
+
+        d_children = None
+        d_type = type(d)
+        if d_type is dict:
+            meta = d.get("meta")
+            if type(meta) is dict and meta.get("type") == "TEXT":
+                total += 1
+            children = d.get("children")
+            if type(children) is list:
+                d_children = children
+        elif d_type is list:
+            d_children = d
+
+        p_children = None
+        p_type = type(p)
+        if p_type is dict:
+            text = p.get("text")
+            if type(text) is dict and type(text.get("segments")) is list:
+                present += 1
+            children = p.get("children")
+            if type(children) is list:
+                p_children = children
+        elif p_type is list:
+            p_children = p
+
+        if d_children is not None and p_children is not None and len(d_children) == len(p_children):
+            stack.extend(zip(d_children, p_children))
+        else:
+            if d_children:
+                total += count_text_nodes_dsl(d_children)
+            if p_children:
+                present += count_text_nodes_with_segments(p_children)
+    return total, present
 
 
 def image_fill_coverage(bundle):
@@ -110,10 +234,9 @@ def variables_resolved_ratio(bundle):
 
 def text_segment_coverage(bundle):
     dsl = bundle.get("dsl_json")
-    total_text_nodes = count_text_nodes_dsl(dsl)
     plugin = bundle.get("plugin_snapshot", {})
     payload = plugin.get("payload") if isinstance(plugin, dict) else None
-    present = count_text_nodes_with_segments(payload)
+    total_text_nodes, present = count_text_nodes_fused(dsl, payload)
     return {
         "total_text_nodes": total_text_nodes,
         "nodes_with_segments": present,
@@ -180,16 +303,11 @@ def main():
     parser.add_argument("--out", default=None)
     args = parser.parse_args()
 
-    save_dir = args.save_dir or os.path.join(os.path.expanduser("~"), "me", "download", "figma-assets")
+    save_dir = args.save_dir or default_save_dir()
     out_path = args.out
     if not out_path:
-        safe_node = args.node_id.replace(":", "_")
-        out_path = os.path.join(
-            os.path.expanduser("~"),
-            "me",
-            "logs",
-            f"figma-accuracy-{safe_node}.json",
-        )
+        safe_node = args.node_id.translate(NODE_ID_FILENAME_TABLE)
+        out_path = os.path.join(default_logs_dir(), f"figma-accuracy-{safe_node}.json")
 
     fidelity_args = {
         "file_key": args.file_key,
@@ -232,10 +350,7 @@ def main():
     if args.use_absolute_bounds:
         bundle_args["use_absolute_bounds"] = True
 
-    fidelity_resp = call_tool(args.mcp_url, "figma_fidelity_loop", fidelity_args)
-    bundle_resp = call_tool(args.mcp_url, "figma_get_node_bundle", bundle_args)
-
-    image_similarity_resp = None
+    image_args = None
     if args.compare_node_id:
         max_scale = args.max_scale if args.max_scale is not None else args.start_scale
         image_args = {
@@ -252,7 +367,17 @@ def main():
             image_args["use_absolute_bounds"] = True
         if args.target_ssim is not None:
             image_args["target_ssim"] = args.target_ssim
-        image_similarity_resp = call_tool(args.mcp_url, "figma_image_similarity", image_args)
+
+    # The tool calls are independent; run them concurrently so wall time is max() not sum()
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        fidelity_fut = ex.submit(call_tool, args.mcp_url, "figma_fidelity_loop", fidelity_args)
+        bundle_fut = ex.submit(call_tool, args.mcp_url, "figma_get_node_bundle", bundle_args)
+        image_fut = None
+        if image_args is not None:
+            image_fut = ex.submit(call_tool, args.mcp_url, "figma_image_similarity", image_args)
+        fidelity_resp = fidelity_fut.result()
+        bundle_resp = bundle_fut.result()
+        image_similarity_resp = image_fut.result() if image_fut else None
 
     report = {
         "generated_at": now_iso(),
@@ -279,8 +404,7 @@ def main():
             report["image_similarity"] = image_similarity_resp
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=2, ensure_ascii=True)
+    write_file(out_path, dumps_json(report, indent=True))
 
     print(out_path)
 
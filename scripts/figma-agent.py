@@ -11,15 +11,20 @@ Uses only stdlib - no external dependencies.
 import json
 import time
 import signal
+import socket
 import logging
-import urllib.request
+import http.client
 import urllib.error
+import urllib.parse
+from collections.abc import Iterator
 
 # Configuration
 FIGMA_MCP_URL = "http://localhost:8940"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_MODEL = "qwen3-coder:30b"
-POLL_INTERVAL = 2  # seconds
+OLLAMA_KEEP_ALIVE = "10m"  # keep the model loaded between queued requests
+POLL_INTERVAL = 2  # seconds, backoff after errors or if long-poll is unsupported
+LONG_POLL_WAIT = 30  # seconds the MCP may hold /agent/pending open
 TIMEOUT = 120  # Ollama can be slow
 
 logging.basicConfig(
@@ -35,18 +40,126 @@ def signal_handler(_sig, _frame):
     global running
     log.info("Shutting down...")
     running = False
+    # A held long-poll or Ollama stream would otherwise block exit (recv resumes
+    # after the handler, PEP 475); shutting the sockets down ends it immediately.
+    for conn in list(_connections.values()):
+        if conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
 
+# Persistent keep-alive connections, keyed by (scheme, host, port)
+_connections: dict[tuple[str, str, int | None], http.client.HTTPConnection] = {}
+
+# Errors meaning a reused keep-alive socket was closed by the server
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+def _get_connection(scheme: str, host: str, port: int | None, timeout: float) -> http.client.HTTPConnection:
+    """Return the cached connection for a host, creating it on first use"""
+    key = (scheme, host, port)
+    conn = _connections.get(key)
+    if conn is None:
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = conn_cls(host, port, timeout=timeout)
+        _connections[key] = conn
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+
+def _send(conn: http.client.HTTPConnection, method: str, path: str,
+          body: bytes | None, headers: dict) -> http.client.HTTPResponse:
+    """Send one request and return the response with its body unread"""
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        return conn.getresponse()
+    except Exception:
+        conn.close()
+        raise
+
+
+def _open(method: str, url: str, body: bytes | None, headers: dict | None,
+          timeout: float) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+    """Send a request over the host's keep-alive connection
+
+    Reconnects once if the server dropped a reused idle connection.
+    Raises urllib.error.HTTPError on 4xx/5xx, like urllib.request.urlopen.
+    """
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    req_headers = {"Connection": "keep-alive"}
+    if headers:
+        req_headers.update(headers)
+
+    conn = _get_connection(parts.scheme, parts.hostname, parts.port, timeout)
+    reused = conn.sock is not None
+    try:
+        resp = _send(conn, method, path, body, req_headers)
+    except _STALE_CONNECTION_ERRORS:
+        # Retry only if an idle keep-alive socket was dropped server-side.
+        # On a fresh connection the server may already have handled the request.
+        if not reused or not running:
+            raise
+        resp = _send(conn, method, path, body, req_headers)
+
+    if resp.status >= 400:
+        conn.close()
+        raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+    return conn, resp
+
+
+def http_request(method: str, url: str, body: bytes | None = None,
+                 headers: dict | None = None, timeout: float = 5) -> dict:
+    """HTTP request over a reused keep-alive connection (stdlib only)"""
+    conn, resp = _open(method, url, body, headers, timeout)
+    try:
+        raw = resp.read()
+    except Exception:
+        conn.close()
+        raise
+    if resp.will_close:
+        conn.close()
+    return json.loads(raw.decode())
+
+
+def http_post_stream(url: str, data: dict, timeout: int = 120) -> Iterator[dict]:
+    """POST and yield each line of a newline-delimited JSON response
+
+    Closing the generator early drops the connection instead of draining it.
+    """
+    body = json.dumps(data).encode()
+    conn, resp = _open("POST", url, body, {"Content-Type": "application/json"}, timeout)
+    finished = False
+    try:
+        for line in resp:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        finished = True
+    finally:
+        if not finished or resp.will_close:
+            conn.close()
+
+
 def http_get(url: str, timeout: int = 5) -> dict | None:
     """Simple HTTP GET using stdlib"""
     try:
-        req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.URLError:
+        return http_request("GET", url, timeout=timeout)
+    except OSError:  # URLError/HTTPError, connection refused, timeout
         return None
     except Exception as e:
         log.debug(f"GET error: {e}")
@@ -57,15 +170,14 @@ def http_post(url: str, data: dict, timeout: int = 120) -> dict | None:
     """Simple HTTP POST using stdlib"""
     try:
         body = json.dumps(data).encode()
-        req = urllib.request.Request(
+        return http_request(
+            "POST",
             url,
-            data=body,
+            body=body,
             headers={"Content-Type": "application/json"},
-            method="POST"
+            timeout=timeout
         )
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.URLError as e:
+    except OSError as e:
         log.debug(f"POST error: {e}")
         return None
     except Exception as e:
@@ -84,18 +196,71 @@ def get_system_prompt(platform: str) -> str:
     return prompts.get(platform, "Generate production-ready code. Output ONLY code, no explanations.")
 
 
-def call_ollama(prompt: str, platform: str) -> str:
-    """Call Ollama for code generation"""
+def call_ollama(prompt: str, platform: str) -> str | None:
+    """Call Ollama for code generation, streaming tokens as they are generated
+
+    Returns None if the agent was asked to stop mid-generation.
+    """
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
         "system": get_system_prompt(platform),
-        "stream": False,
+        "stream": True,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
     }
-    result = http_post(OLLAMA_URL, payload, timeout=TIMEOUT)
-    if result:
-        return result.get("response", "// No response from Ollama")
-    return "// Error: Ollama request failed"
+    parts = []
+    received = False
+    try:
+        stream = http_post_stream(OLLAMA_URL, payload, timeout=TIMEOUT)
+        try:
+            for chunk in stream:
+                if not running:
+                    return None
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                received = True
+                parts.append(chunk.get("response", ""))
+        finally:
+            stream.close()
+    except Exception as e:
+        if not running:
+            return None  # stream aborted by shutdown, not an Ollama failure
+        log.debug(f"Ollama error: {e}")
+        return "// Error: Ollama request failed"
+    if not received:
+        return "// No response from Ollama"
+    return "".join(parts)
+
+
+def process_request(req: dict) -> bool:
+    """Generate code for one queued request and submit it
+
+    Returns False if the agent was stopped mid-generation.
+    """
+    req_id = req["id"]
+    platform = req.get("platform", "react")
+    prompt = req.get("prompt", "")
+
+    log.info(f"📥 Processing {req_id} ({platform})")
+
+    # Call Ollama
+    code = call_ollama(prompt, platform)
+    if code is None:
+        log.info(f"⏹️  Interrupted {req_id}, left pending")
+        return False
+
+    # Submit result
+    result_payload = {
+        "request_id": req_id,
+        "code": code
+    }
+    submit_result = http_post(f"{FIGMA_MCP_URL}/agent/result", result_payload, timeout=10)
+
+    if submit_result:
+        log.info(f"✅ Completed {req_id}")
+    else:
+        log.error(f"❌ Failed to submit {req_id}")
+    return True
 
 
 def poll_and_process():
@@ -106,39 +271,27 @@ def poll_and_process():
 
     while running:
         try:
-            # Poll for pending requests
-            data = http_get(f"{FIGMA_MCP_URL}/agent/pending")
+            # Long-poll for pending requests (server holds the GET until work arrives)
+            data = http_get(
+                f"{FIGMA_MCP_URL}/agent/pending?wait={LONG_POLL_WAIT}",
+                timeout=LONG_POLL_WAIT + 5
+            )
             if not data:
-                time.sleep(POLL_INTERVAL)
+                if running:
+                    time.sleep(POLL_INTERVAL)
                 continue
 
             pending = data.get("pending", [])
             if not pending:
-                time.sleep(POLL_INTERVAL)
+                # Older servers ignore ?wait and answer immediately
+                if "wait" not in data:
+                    time.sleep(POLL_INTERVAL)
                 continue
 
-            # Process first pending request
-            req = pending[0]
-            req_id = req["id"]
-            platform = req.get("platform", "react")
-            prompt = req.get("prompt", "")
-
-            log.info(f"📥 Processing {req_id} ({platform})")
-
-            # Call Ollama
-            code = call_ollama(prompt, platform)
-
-            # Submit result
-            result_payload = {
-                "request_id": req_id,
-                "code": code
-            }
-            submit_result = http_post(f"{FIGMA_MCP_URL}/agent/result", result_payload, timeout=10)
-
-            if submit_result:
-                log.info(f"✅ Completed {req_id}")
-            else:
-                log.error(f"❌ Failed to submit {req_id}")
+            # Drain everything queued before polling again
+            for req in pending:
+                if not running or not process_request(req):
+                    break
 
         except Exception as e:
             log.error(f"Error: {e}")
@@ -2,22 +2,104 @@
 """
 ssim_compare.py - NumPy 기반 SSIM 계산 (scikit-image 없이)
 
+SSIM은 Wang et al.과 동일하게 11×11 Gaussian 윈도우(σ=1.5)의 지역 SSIM 평균.
+
 Usage: python3 ssim_compare.py <image1.png> <image2.png>
 Output: JSON {"ssim": 0.95, "psnr": 35.2, "mse": 0.001}
 
+SSIM_COMPARE_JIT=1: numba 커널(ssim_numba.py) 사용. numba import/캐시 로드 비용이
+있어 한 번 실행하는 CLI에는 손해, 같은 프로세스에서 반복 호출하는 배치에서만 켤 것.
+
 Part of the Visual Feedback Loop for 95%+ Figma-to-Code accuracy.
 """
 
+import os
 import sys
 import json
+import hashlib
 import numpy as np
 from PIL import Image
 
+# Wang et al. (2004) 기본 윈도우
+GAUSS_WINDOW = 11
+GAUSS_SIGMA = 1.5
+
+# numba 커널: opt-in, 첫 ssim() 호출 시에만 import
+_jit_kernel = None
+_jit_checked = False
+
+
+def _load_jit_kernel():
+    """SSIM_COMPARE_JIT=1이면 numba 커널 lazy import, 아니면/없으면 None"""
+    global _jit_kernel, _jit_checked
+    if not _jit_checked:
+        _jit_checked = True
+        if os.environ.get("SSIM_COMPARE_JIT") == "1":
+            try:
+                from ssim_numba import ssim_map_mean
+                _jit_kernel = ssim_map_mean
+            except ImportError:  # numba 없으면 NumPy 경로
+                _jit_kernel = None
+    return _jit_kernel
+
 
 def load_image(path: str) -> np.ndarray:
-    """이미지를 grayscale numpy array로 로드"""
-    img = Image.open(path).convert('L')  # grayscale
-    return np.array(img, dtype=np.float64)
+    """이미지를 grayscale uint8 numpy array로 로드 (float 변환은 계산 시점에)"""
+    with Image.open(path) as img:
+        img.draft('L', img.size)  # JPEG는 디코딩 단계에서 바로 grayscale
+        if img.mode != 'L':
+            img = img.convert('L')
+        return np.asarray(img)
+
+
+def _gaussian_kernel(size: int, sigma: float) -> np.ndarray:
+    """정규화된 1-D Gaussian 커널 (float64: 가중치 합이 정확히 1에 가까워야 함)"""
+    x = np.arange(size, dtype=np.float64) - (size - 1) / 2
+    kernel = np.exp(-(x * x) / (2 * sigma * sigma))
+    return kernel / kernel.sum()
+
+
+_GAUSS_KERNEL = _gaussian_kernel(GAUSS_WINDOW, GAUSS_SIGMA)
+
+
+def _filter_valid(img: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """분리형 Gaussian 필터 ('valid' 모드): 가로 → 세로 1-D 컨볼루션, O(N·k)
+
+    float64로 계산. E[X²] - E[X]²는 평탄한 영역에서 상쇄 오차가 커서
+    float32로는 SSIM 소수 6자리가 틀어짐.
+    """
+    k = kernel.size
+    h, w = img.shape
+    ow, oh = w - k + 1, h - k + 1
+
+    # 가로 패스
+    tmp = np.multiply(img[:, :ow], kernel[0], dtype=np.float64)
+    scratch = np.empty_like(tmp)
+    for i in range(1, k):
+        np.multiply(img[:, i:i + ow], kernel[i], out=scratch)
+        tmp += scratch
+
+    # 세로 패스
+    out = np.multiply(tmp[:oh], kernel[0])
+    scratch = scratch[:oh]
+    for i in range(1, k):
+        np.multiply(tmp[i:i + oh], kernel[i], out=scratch)
+        out += scratch
+    return out
+
+
+def _crop_to_common(img1: np.ndarray, img2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """크기가 다르면 작은 쪽에 맞춰 자름
+
+    잘린 slice는 strided view라서 contiguous로 한 번만 복사
+    (이미 contiguous인 경우 복사 없음). 이후 필터/리덕션이 연속 메모리로 동작.
+    """
+    if img1.shape != img2.shape:
+        h = min(img1.shape[0], img2.shape[0])
+        w = min(img1.shape[1], img2.shape[1])
+        img1 = np.ascontiguousarray(img1[:h, :w])
+        img2 = np.ascontiguousarray(img2[:h, :w])
+    return img1, img2
 
 
 def ssim(img1: np.ndarray, img2: np.ndarray,
@@ -29,58 +111,93 @@ def ssim(img1: np.ndarray, img2: np.ndarray,
     "Image quality assessment: from error visibility to structural similarity."
     IEEE Transactions on Image Processing, 13(4), 600-612.
     """
-    # 같은 크기로 맞춤
-    if img1.shape != img2.shape:
-        # 작은 쪽에 맞춤
-        h = min(img1.shape[0], img2.shape[0])
-        w = min(img1.shape[1], img2.shape[1])
-        img1 = img1[:h, :w]
-        img2 = img2[:h, :w]
+    img1, img2 = _crop_to_common(img1, img2)
+
+    # 이미지가 윈도우보다 작으면 홀수 크기로 축소
+    size = min(GAUSS_WINDOW, *img1.shape)
+    if size % 2 == 0:
+        size -= 1
+    kernel = _GAUSS_KERNEL if size == GAUSS_WINDOW else _gaussian_kernel(size, GAUSS_SIGMA)
 
-    # Mean
-    mu1 = img1.mean()
-    mu2 = img2.mean()
+    jit_kernel = _load_jit_kernel()
+    if jit_kernel is not None:
+        return float(jit_kernel(img1, img2, kernel, C1, C2))
 
-    # Variance and Covariance
-    sigma1_sq = ((img1 - mu1) ** 2).mean()
-    sigma2_sq = ((img2 - mu2) ** 2).mean()
-    sigma12 = ((img1 - mu1) * (img2 - mu2)).mean()
+    x = img1.astype(np.float64, copy=False)
+    y = img2.astype(np.float64, copy=False)
 
-    # SSIM formula
-    numerator = (2 * mu1 * mu2 + C1) * (2 * sigma12 + C2)
-    denominator = (mu1 ** 2 + mu2 ** 2 + C1) * (sigma1_sq + sigma2_sq + C2)
+    # 지역 평균
+    mu1 = _filter_valid(x, kernel)
+    mu2 = _filter_valid(y, kernel)
+    mu1_sq = mu1 * mu1
+    mu2_sq = mu2 * mu2
+    mu1_mu2 = mu1 * mu2
 
-    return numerator / denominator
+    # 지역 분산/공분산: E[X²] - E[X]²
+    sigma1_sq = _filter_valid(x * x, kernel) - mu1_sq
+    sigma2_sq = _filter_valid(y * y, kernel) - mu2_sq
+    sigma12 = _filter_valid(x * y, kernel) - mu1_mu2
+
+    # SSIM map → 평균
+    numerator = (2 * mu1_mu2 + C1) * (2 * sigma12 + C2)
+    denominator = (mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2)
+
+    return float((numerator / denominator).mean(dtype=np.float64))
 
 
 def psnr(img1: np.ndarray, img2: np.ndarray) -> float:
     """Peak Signal-to-Noise Ratio (PSNR) 계산"""
-    mse_val = mse(img1, img2)
+    return _psnr_from_mse(mse(img1, img2))
+
+
+def _psnr_from_mse(mse_val: float) -> float:
+    """MSE → PSNR (MSE를 이미 계산한 경우 재사용)"""
     if mse_val == 0:
         return float('inf')
     max_pixel = 255.0
-    return 10 * np.log10((max_pixel ** 2) / mse_val)
+    return float(10 * np.log10((max_pixel ** 2) / mse_val))
 
 
 def mse(img1: np.ndarray, img2: np.ndarray) -> float:
     """Mean Squared Error 계산"""
-    if img1.shape != img2.shape:
-        h = min(img1.shape[0], img2.shape[0])
-        w = min(img1.shape[1], img2.shape[1])
-        img1 = img1[:h, :w]
-        img2 = img2[:h, :w]
+    img1, img2 = _crop_to_common(img1, img2)
 
-    return ((img1 - img2) ** 2).mean()
+    # 차이 버퍼 하나만 float32로 할당해서 in-place 제곱 (uint8 wrap-around 방지)
+    buf = np.subtract(img1, img2, dtype=np.float32)
+    np.square(buf, out=buf)
+    return float(buf.mean(dtype=np.float64))
 
 
-def compare_images(path1: str, path2: str) -> dict:
-    """두 이미지 비교"""
-    img1 = load_image(path1)
-    img2 = load_image(path2)
+def _sha256(path: str) -> bytes:
+    """파일 SHA-256 digest"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def _same_file_content(path1: str, path2: str) -> bool:
+    """크기가 같을 때만 해시 비교 (크기 다르면 즉시 False)"""
+    if os.path.getsize(path1) != os.path.getsize(path2):
+        return False
+    return _sha256(path1) == _sha256(path2)
+
+
+IDENTICAL_RESULT = {"ssim": 1.0, "psnr": 100.0, "mse": 0.0}
+
+
+def _compare(img1: np.ndarray, img2: np.ndarray) -> dict:
+    """crop 한 번 + MSE 한 번으로 SSIM/PSNR/MSE 계산"""
+    img1, img2 = _crop_to_common(img1, img2)
+
+    # 인코딩만 다르고 픽셀이 같은 경우
+    if np.array_equal(img1, img2):
+        return dict(IDENTICAL_RESULT)
 
     ssim_score = ssim(img1, img2)
-    psnr_score = psnr(img1, img2)
     mse_score = mse(img1, img2)
+    psnr_score = _psnr_from_mse(mse_score)
 
     return {
         "ssim": round(ssim_score, 6),
@@ -89,6 +206,15 @@ def compare_images(path1: str, path2: str) -> dict:
     }
 
 
+def compare_images(path1: str, path2: str) -> dict:
+    """두 이미지 비교"""
+    # 바이트 단위로 같은 파일이면 디코딩/계산 생략
+    if _same_file_content(path1, path2):
+        return dict(IDENTICAL_RESULT)
+
+    return _compare(load_image(path1), load_image(path2))
+
+
 if __name__ == "__main__":
     if len(sys.argv) != 3:
         print(json.dumps({"error": "Usage: ssim_compare.py <image1> <image2>"}))
@@ -0,0 +1,75 @@
+"""
+ssim_numba.py - Numba JIT SSIM 커널 (선택 의존성)
+
+ssim_compare.py가 SSIM_COMPARE_JIT=1일 때만 lazy import. 없으면 NumPy 경로로 동작.
+가로/세로 Gaussian 패스와 SSIM map 평균을 하나의 커널에서 처리해
+중간 map(mu, sigma 등)을 만들지 않음. cache=True로 컴파일 결과를 디스크에 캐시.
+
+E[X²] - E[X]²는 평탄한 영역(UI 캡처의 대부분)에서 상쇄 오차가 커서
+모멘트는 float64로 저장하고 fastmath는 쓰지 않음 (재결합 시 SSIM > 1 가능).
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, parallel=True)
+def ssim_map_mean(img1, img2, kernel, C1, C2):
+    """11×11 Gaussian 윈도우 SSIM map 평균 ('valid' 모드)"""
+    h, w = img1.shape
+    k = kernel.size
+    oh = h - k + 1
+    ow = w - k + 1
+
+    # 가로 패스: E[X], E[Y], E[X²], E[Y²], E[XY]
+    horiz = np.empty((5, h, ow), dtype=np.float64)
+    for i in prange(h):
+        for j in range(ow):
+            a1 = 0.0
+            a2 = 0.0
+            a11 = 0.0
+            a22 = 0.0
+            a12 = 0.0
+            for t in range(k):
+                g = kernel[t]
+                x = np.float64(img1[i, j + t])
+                y = np.float64(img2[i, j + t])
+                a1 += g * x
+                a2 += g * y
+                a11 += g * x * x
+                a22 += g * y * y
+                a12 += g * x * y
+            horiz[0, i, j] = a1
+            horiz[1, i, j] = a2
+            horiz[2, i, j] = a11
+            horiz[3, i, j] = a22
+            horiz[4, i, j] = a12
+
+    # 세로 패스 + 픽셀별 SSIM, 행 단위로 합산
+    row_sums = np.zeros(oh, dtype=np.float64)
+    for i in prange(oh):
+        acc = 0.0
+        for j in range(ow):
+            mu1 = 0.0
+            mu2 = 0.0
+            m11 = 0.0
+            m22 = 0.0
+            m12 = 0.0
+            for t in range(k):
+                g = kernel[t]
+                mu1 += g * horiz[0, i + t, j]
+                mu2 += g * horiz[1, i + t, j]
+                m11 += g * horiz[2, i + t, j]
+                m22 += g * horiz[3, i + t, j]
+                m12 += g * horiz[4, i + t, j]
+            mu1_sq = mu1 * mu1
+            mu2_sq = mu2 * mu2
+            mu1_mu2 = mu1 * mu2
+            sigma1_sq = m11 - mu1_sq
+            sigma2_sq = m22 - mu2_sq
+            sigma12 = m12 - mu1_mu2
+            acc += ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / \
+                   ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
+        row_sums[i] = acc
+
+    return row_sums.sum() / (oh * ow)